@@ -31,14 +31,18 @@ from helpers import cast_output, typedict2tensor  # pytype: disable=import-error
 _INPUT_PARAMETERS_NAMES = list(typing.get_type_hints(LengthParam)) + list(typing.get_type_hints(SamplingParam))
 
 
+def get_text_generation_model(model):
+    """Returns model used for text generation - frozen model of prompt learning model or model itself."""
+    is_prompt_learning_model = hasattr(model, "virtual_prompt_style")
+    return model.frozen_model if is_prompt_learning_model else model
+
+
 class NemoGptCallable:
     def __init__(self, *, model_name: str, model):
         self.model_name = model_name
         self._model = model.cuda()
         self._is_prompt_learning_model = hasattr(model, "virtual_prompt_style")
-        self._text_generate_fn = (
-            self._model.frozen_model.generate if self._is_prompt_learning_model else self._model.generate
-        )
+        self._text_generate_fn = get_text_generation_model(self._model).generate
         self._task_generate_fn = self._model.generate if self._is_prompt_learning_model else None
         self.inputs = (
             (
@@ -65,15 +69,24 @@ class NemoGptCallable:
             )
         return formatted_prompts
 
-    @batch
-    @group_by_values("tasks", *_INPUT_PARAMETERS_NAMES, pad_fn=ConstantPadder(0))
-    @first_value(*_INPUT_PARAMETERS_NAMES)
-    def infer(self, **inputs: np.ndarray) -> typing.Dict[str, np.ndarray]:
+    def warmup(self):
+        """Run short text generation, so first compilation of the model is not done while handling requests."""
+        self._broadcast_generate_choice()
+        self._text_generate_fn(inputs=["Warmup"], length_params=LengthParam(max_length=1, min_length=0))
+
+    @staticmethod
+    def _broadcast_generate_choice():
         # Tell other ranks we're doing generate
         generate_num = 0
         choice = torch.cuda.LongTensor([generate_num])
         torch.distributed.broadcast(choice, 0)
 
+    @batch
+    @group_by_values("tasks", *_INPUT_PARAMETERS_NAMES, pad_fn=ConstantPadder(0))
+    @first_value(*_INPUT_PARAMETERS_NAMES)
+    def infer(self, **inputs: np.ndarray) -> typing.Dict[str, np.ndarray]:
+        self._broadcast_generate_choice()
+
         def _str_ndarray2list(str_ndarray: np.ndarray) -> typing.List[str]:
             str_ndarray = str_ndarray.astype("bytes")
             str_ndarray = np.char.decode(str_ndarray, encoding="utf-8")
@@ -24,7 +24,7 @@ from pytorch_lightning.trainer.trainer import Trainer  # pytype: disable=import-
 from pytriton.model_config import ModelConfig
 from pytriton.triton import Triton, TritonConfig
 
-from gpt import NemoGptCallable  # pytype: disable=import-error # isort:skip
+from gpt import NemoGptCallable, get_text_generation_model  # pytype: disable=import-error # isort:skip
 from helpers import (  # pytype: disable=import-error # isort:skip
     download_hf_model,
     load_model,
@@ -73,6 +73,12 @@ def main():
         required=False,
         help="Process group communication timeout",
     )
+    parser.add_argument(
+        "--compile",
+        default=False,
+        action="store_true",
+        help="Compile model with torch.compile (requires PyTorch 2.2 or newer)",
+    )
     parser.add_argument(
         "--verbose",
         default=False,
@@ -102,9 +108,17 @@ def main():
     model = load_model(model_path, trainer, prompt_learning_model_path=args.prompt_model_path)
 
     app_state = setup_distributed_environment(trainer)
+    if args.compile:
+        # all ranks run the same graph, so the model has to be compiled on each of them
+        logger.info("Compiling model")
+        get_text_generation_model(model).model.compile(mode="reduce-overhead")
+
     if app_state.global_rank == 0:
 
         infer_callable = NemoGptCallable(model_name="GPT", model=model)
+        if args.compile:
+            logger.info("Warming up compiled model")
+            infer_callable.warmup()
 
         triton_config = TritonConfig(http_address=ENDPOINT_BIND_ADDRESS, http_port=HTTP_PORT)
         with Triton(config=triton_config) as triton:
@@ -119,12 +133,12 @@ def main():
             triton.serve()
     else:
         logger.info(f"Running worker with rank {torch.distributed.get_rank()}")
+        model = model.cuda()
+        choice = torch.empty(1, dtype=torch.long, device="cuda")
         while True:
-            choice = torch.cuda.LongTensor(1)
             torch.distributed.broadcast(choice, 0)
-            logger.info(f"{choice}")
             if choice[0].item() == 0:
-                generate(model.cuda())
+                generate(model)
 
 
 if __name__ == "__main__":
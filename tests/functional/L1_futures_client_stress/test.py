@@ -27,7 +27,7 @@ METADATA = {
 
 
 def main():
-    from tests.functional.common.tests.futures_client_stress import futures_stress_test
+    from tests.functional.common.tests.futures_client_stress import DEFAULT_INSTANCES, futures_stress_test
     from tests.utils import DEFAULT_LOG_FORMAT
 
     parser = argparse.ArgumentParser(description="HuggigFace DistillBERT functional test.")
@@ -52,6 +52,20 @@ def main():
         type=int,
         help="Maximal batch size used for model deployment",
     )
+    parser.add_argument(
+        "--instances",
+        required=False,
+        default=DEFAULT_INSTANCES,
+        type=int,
+        help="Number of model instances",
+    )
+    parser.add_argument(
+        "--client-batch",
+        required=False,
+        default=1,
+        type=int,
+        help="Number of samples sent in a single request",
+    )
     parser.add_argument(
         "--seed",
         type=int,
@@ -61,7 +75,7 @@ def main():
     parser.add_argument(
         "--verbose",
         action="store_true",
-        help="Provide verbose logs",
+        help="Provide verbose test logs (Triton server logs verbosity is not affected)",
     )
     args = parser.parse_args()
 
@@ -74,8 +88,9 @@ def main():
         test_time_s=args.test_time_s,
         init_timeout_s=args.init_timeout_s,
         batch_size=args.batch_size,
-        verbose=args.verbose,
         seed=args.seed,
+        instances=args.instances,
+        client_batch=args.client_batch,
     )
 
 
@@ -35,6 +35,7 @@ class TestModelSpec:
     inputs: Sequence[Tensor]
     outputs: Sequence[Tensor]
     model_config: ModelConfig
+    instances: int = 1
 
 
 def _create_add_sub_fn() -> Callable:
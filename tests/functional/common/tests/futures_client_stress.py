@@ -15,12 +15,15 @@
 Runs inference session over  NLP model
 """
 
+import collections
+import functools
 import logging
 import pathlib
+import random
 import tempfile
-import textwrap
-from concurrent.futures import FIRST_COMPLETED, wait
-from typing import Callable
+import threading
+import time
+from typing import Callable, Dict, Iterator
 
 import numpy as np
 
@@ -37,46 +40,44 @@ VOCABULARY_SIZE = 30522
 VALID_TOKEN_ID = 5
 MIN_SEQUENCE_LENGTH = 20
 MAX_SEQUENCE_LENGTH = 128
+MAX_BATCH_SIZE = 16
 RANDOM_SEED = 42
+DEFAULT_INSTANCES = 2
+_NS_IN_S = 1_000_000_000
+_TIME_LEFT_LOG_INTERVAL_NS = 10 * _NS_IN_S
+_TRITON_LOGS_TAIL_LINES = 10_000
 
+# preallocated once and sliced per request
+_INPUT_IDS = np.full((MAX_BATCH_SIZE, MAX_SEQUENCE_LENGTH), VALID_TOKEN_ID, dtype=np.int32)
+_ATTENTION_MASK = np.ones((1, MAX_SEQUENCE_LENGTH), dtype=np.uint8)
+# row n holds attention mask of sequence of length n padded to MAX_SEQUENCE_LENGTH
+_SEQUENCE_LENGTHS = np.arange(MAX_SEQUENCE_LENGTH + 1)[:, np.newaxis]
+_PADDED_ATTENTION_MASKS = (np.arange(MAX_SEQUENCE_LENGTH) < _SEQUENCE_LENGTHS).astype(np.uint8)
 
-def futures_stress_test(test_time_s: int, init_timeout_s: int, batch_size: int, seed: int, verbose: bool):
 
-    model_name = "distilbert-base-uncased"
+def futures_stress_test(
+    test_time_s: int,
+    init_timeout_s: int,
+    batch_size: int,
+    seed: int,
+    instances: int = DEFAULT_INSTANCES,
+    client_batch: int = 1,
+):
 
-    model_spec = _model_spec()
+    if not 1 <= client_batch <= MAX_BATCH_SIZE:
+        raise ValueError(f"client_batch should be in range [1, {MAX_BATCH_SIZE}]. Got {client_batch}")
 
-    import random
+    model_name = "distilbert-base-uncased"
 
-    random.seed(seed)
+    model_spec = _model_spec(instances=instances)
 
-    def requests_generator():
-        while True:
-            inputs_len = random.randint(MIN_SEQUENCE_LENGTH, MAX_SEQUENCE_LENGTH)
-            input_ids = (
-                np.zeros(
-                    (
-                        1,
-                        inputs_len,
-                    ),
-                    dtype=np.int64,
-                )
-                + 5
-            )
-            attention_mask = np.ones(
-                (
-                    1,
-                    inputs_len,
-                ),
-                dtype=np.int64,
-            )
-            yield {"input_ids": input_ids, "attention_mask": attention_mask}
+    random.seed(seed)
 
-    requests = requests_generator()
+    requests = _requests_generator(client_batch)
 
     logger.info("starting server")
 
-    infer_fn = model_spec.create_infer_fn(model_name=model_name)
+    infer_fns = [model_spec.create_infer_fn(model_name=model_name) for _ in range(model_spec.instances)]
     with tempfile.TemporaryDirectory() as temp_dir:
         triton_log_path = pathlib.Path(temp_dir) / "triton.log"
         try:
@@ -84,13 +85,14 @@ def futures_stress_test(test_time_s: int, init_timeout_s: int, batch_size: int,
                 grpc_port=find_free_port(),
                 http_port=find_free_port(),
                 metrics_port=find_free_port(),
-                log_verbose=int(verbose),
+                # verbose server logging adds per-request overhead and skews stress measurements
+                log_verbose=0,
                 log_file=triton_log_path,
             )
             with Triton(config=triton_config) as triton:
                 triton.bind(
                     model_name=model_spec.name,
-                    infer_func=infer_fn,
+                    infer_func=infer_fns,
                     inputs=model_spec.inputs,
                     outputs=model_spec.outputs,
                     config=model_spec.model_config,
@@ -103,67 +105,141 @@ def futures_stress_test(test_time_s: int, init_timeout_s: int, batch_size: int,
                     # Wait for model
                     client.wait_for_model(init_timeout_s).result()
 
-                    import time
+                    # spawn client worker threads and set up connections before the measured loop
+                    warmup_request = _create_request(MIN_SEQUENCE_LENGTH)
+                    warmup_futures = [client.infer_batch(**warmup_request) for _ in range(batch_size)]
+                    for future in warmup_futures:
+                        future.result()
 
-                    should_stop_at_s = time.time() + test_time_s
+                    deadline_ns = time.monotonic_ns() + test_time_s * _NS_IN_S
+                    next_log_ns = time.monotonic_ns()
 
+                    # each in-flight request holds one token; tokens are returned from done callbacks,
+                    # so the loop below only produces requests and never polls futures
+                    in_flight_tokens = threading.Semaphore(batch_size)
+                    processed_lock = threading.Lock()
+                    errors = []
                     number_of_processed_requests = 0
 
-                    not_done = {*()}
+                    def _on_request_done(future):
+                        nonlocal number_of_processed_requests
+                        try:
+                            if future.exception() is not None:
+                                errors.append(future.exception())
+                                return
+                            with processed_lock:
+                                number_of_processed_requests += 1
+                                processed = number_of_processed_requests
+                            if processed % 10 == 0 and logger.isEnabledFor(logging.DEBUG):
+                                time_left_s = max(deadline_ns - time.monotonic_ns(), 0) / _NS_IN_S
+                                logger.debug(
+                                    "Processed %d batches time left: %0.1fs \n.Result: %d.",
+                                    processed,
+                                    time_left_s,
+                                    len(future.result()),
+                                )
+                        finally:
+                            in_flight_tokens.release()
+
                     for request in requests:
-                        result_future = client.infer_batch(**request)
-                        not_done.add(result_future)
-                        if len(not_done) > batch_size:
-                            done, not_done = wait(not_done, return_when=FIRST_COMPLETED)
-                            if len(done) > 0:
-                                future = done.pop()
-                                result = future.result()
-                                number_of_processed_requests += len(done)
-                                if number_of_processed_requests > 0 and number_of_processed_requests % 10 == 0:
-                                    time_left_s = max(should_stop_at_s - time.time(), 0.0)
-                                    logger.debug(
-                                        f"Processed {number_of_processed_requests} batches time left: {time_left_s:0.1f}s \n."
-                                        f"Result: {len(result)}."
-                                    )
-                        time_left_s = max(should_stop_at_s - time.time(), 0.0)
-                        if time_left_s % 10 == 0:
-                            logger.info(f"Time left: {time_left_s:0.1f}s")
-                        if time_left_s <= 0:
+                        in_flight_tokens.acquire()
+                        if errors:
+                            raise errors[0]
+                        client.infer_batch(**request).add_done_callback(_on_request_done)
+                        now_ns = time.monotonic_ns()
+                        if now_ns >= deadline_ns:
                             break
-                logger.info(f"Test finished. Processed {number_of_processed_requests} requests")
+                        if now_ns >= next_log_ns:
+                            logger.info(f"Time left: {(deadline_ns - now_ns) / _NS_IN_S:0.1f}s")
+                            next_log_ns += _TIME_LEFT_LOG_INTERVAL_NS
+
+                    # wait for requests still in flight
+                    for _ in range(batch_size):
+                        in_flight_tokens.acquire()
+                    if errors:
+                        raise errors[0]
+                logger.info(
+                    f"Test finished. Processed {number_of_processed_requests} requests "
+                    f"({number_of_processed_requests * client_batch} samples)"
+                )
 
         finally:
-            if triton_log_path.exists():
+            if logger.isEnabledFor(logging.DEBUG) and triton_log_path.exists():
                 logger.debug("-" * 64)
-                server_logs = triton_log_path.read_text(errors="replace")
-                server_logs = "--- triton logs:\n\n" + textwrap.indent(server_logs, prefix=" " * 8)
-                logger.debug(server_logs)
+                # stream only the tail as logs of long verbose runs may not fit in memory
+                with triton_log_path.open(errors="replace") as triton_log_file:
+                    server_logs_tail = collections.deque(triton_log_file, maxlen=_TRITON_LOGS_TAIL_LINES)
+                indent = " " * 8
+                server_logs = "".join(indent + line for line in server_logs_tail)
+                logger.debug(f"--- triton logs (last {len(server_logs_tail)} lines):\n\n{server_logs}")
     logger.info("Test finished")
 
 
+def _requests_generator(client_batch: int) -> Iterator[Dict[str, np.ndarray]]:
+    if client_batch == 1:
+        # requests are built once per sequence length; the client only reads them, so they may be sent many times
+        requests_by_length = {
+            inputs_len: _create_request(inputs_len)
+            for inputs_len in range(MIN_SEQUENCE_LENGTH, MAX_SEQUENCE_LENGTH + 1)
+        }
+        while True:
+            inputs_len = random.randint(MIN_SEQUENCE_LENGTH, MAX_SEQUENCE_LENGTH)
+            yield requests_by_length[inputs_len]
+    else:
+        inputs_lens = np.empty(client_batch, dtype=np.intp)
+        while True:
+            for idx in range(client_batch):
+                inputs_lens[idx] = random.randint(MIN_SEQUENCE_LENGTH, MAX_SEQUENCE_LENGTH)
+            yield _create_batched_request(inputs_lens)
+
+
+def _create_request(inputs_len: int) -> Dict[str, np.ndarray]:
+    # contiguous inputs are serialized by the client without an intermediate copy
+    return {
+        "input_ids": np.ascontiguousarray(_INPUT_IDS[:1, :inputs_len]),
+        "attention_mask": np.ascontiguousarray(_ATTENTION_MASK[:, :inputs_len]),
+    }
+
+
+def _create_batched_request(inputs_lens: np.ndarray) -> Dict[str, np.ndarray]:
+    # sequences are padded to the longest one in the batch; padding is masked out with zeros in attention_mask
+    batch_size, max_inputs_len = len(inputs_lens), inputs_lens.max()
+    return {
+        # all ids are equal, so the flattened buffer prefix is a contiguous (batch_size, max_inputs_len) view
+        "input_ids": _INPUT_IDS.reshape(-1)[: batch_size * max_inputs_len].reshape(batch_size, max_inputs_len),
+        # fancy indexing of the precomputed table already returns a new contiguous array
+        "attention_mask": _PADDED_ATTENTION_MASKS[inputs_lens, :max_inputs_len],
+    }
+
+
 def _create_hf_tensorflow_distilbert_base_uncased_fn(model_name: str) -> Callable:
+    # seeded from the global RNG, so output lengths follow --seed and differ between model instances
+    rng = random.Random(random.getrandbits(64))
+    # stub outputs are read-only zeros, so every batch returns a view of the same buffer
+    # (np.zeros is backed by lazily mapped zero pages, thus it costs nothing until touched)
+    logits = np.zeros((MAX_BATCH_SIZE, MAX_SEQUENCE_LENGTH, VOCABULARY_SIZE), dtype=np.float32)
+
     @batch
     def _infer_fn(input_ids, attention_mask):
         assert input_ids.shape == attention_mask.shape
-        import random
-
-        outputs_len = random.randint(20, 128)
-        result = np.zeros([input_ids.shape[0], outputs_len, VOCABULARY_SIZE], dtype=np.float32)
-        logger.debug(f"input_ids: {input_ids.shape}")
-        logger.debug(f"attention_mask: {attention_mask.shape}")
+        outputs_len = rng.randrange(MIN_SEQUENCE_LENGTH, MAX_SEQUENCE_LENGTH + 1)
+        result = logits[: input_ids.shape[0], :outputs_len]
+        logger.debug("input_ids: %s", input_ids.shape)
+        logger.debug("attention_mask: %s", attention_mask.shape)
         return {"logits": result}
 
     return _infer_fn
 
 
-def _model_spec() -> TestModelSpec:
+@functools.lru_cache(maxsize=None)
+def _model_spec(instances: int = DEFAULT_INSTANCES) -> TestModelSpec:
     model_spec = TestModelSpec(
         name="DistilBert",
         framework=Framework.TENSORFLOW,
         create_infer_fn=_create_hf_tensorflow_distilbert_base_uncased_fn,
         inputs=(
-            Tensor(name="input_ids", dtype=np.int64, shape=(-1,)),
-            Tensor(name="attention_mask", dtype=np.int64, shape=(-1,)),
+            Tensor(name="input_ids", dtype=np.int32, shape=(-1,)),
+            Tensor(name="attention_mask", dtype=np.uint8, shape=(-1,)),
         ),
         outputs=(
             Tensor(
@@ -173,10 +249,12 @@ def _model_spec() -> TestModelSpec:
             ),
         ),
         model_config=ModelConfig(
-            max_batch_size=16,
+            max_batch_size=MAX_BATCH_SIZE,
             batcher=DynamicBatcher(
-                max_queue_delay_microseconds=5000,
+                max_queue_delay_microseconds=50_000,
+                preferred_batch_size=[4, 8, MAX_BATCH_SIZE],
             ),
         ),
+        instances=instances,
     )
     return model_spec
@@ -14,8 +14,10 @@
 
 # import time
 
+import asyncio
+import contextlib
 import gc
-import logging
+import sys
 import threading
 import unittest
 from unittest.mock import ANY
@@ -23,6 +25,7 @@ from unittest.mock import ANY
 import async_timeout
 import numpy as np
 import pytest
+import pytest_mock
 from tritonclient.grpc.aio import InferenceServerClient as AsyncioGrpcInferenceServerClient
 from tritonclient.http.aio import InferenceServerClient as AsyncioHttpInferenceServerClient
 
@@ -53,10 +56,54 @@ from .utils import (
     wrap_to_http_infer_result,
 )
 
-_LOGGER = logging.getLogger(__name__)
-
 _MAX_TEST_TIME = 10.0
 
+if sys.version_info >= (3, 11):
+    _timeout = asyncio.timeout  # pytype: disable=module-attr
+else:
+    _timeout = async_timeout.timeout
+
+_A_ONE = np.array([1], dtype=np.float32)
+_A_ONE.setflags(write=False)
+_B_ONE = np.array([1], dtype=np.float32)
+_B_ONE.setflags(write=False)
+
+_GRPC_CLIENT_UP_AND_READY_METHODS = (
+    "is_server_ready",
+    "is_server_live",
+    "get_model_repository_index",
+    "is_model_ready",
+    "get_model_config",
+)
+
+
+@pytest.fixture(scope="module")
+def grpc_server_mocks(request):
+    # mocks are prepared once per module (and model config passed with indirect parametrization)
+    # and attached only for tests requesting patched_grpc_server,
+    # as keeping them attached for whole module would affect tests which require not responding server;
+    # private mocker is used to not stop patches made by other users of module_mocker
+    mocker = pytest_mock.MockerFixture(request.config)
+    model_config = getattr(request, "param", ADD_SUB_WITH_BATCHING_MODEL_CONFIG)
+    patch_client__server_up_and_ready(mocker, AsyncioGrpcInferenceServerClient)
+    patch_grpc_client__model_up_and_ready(mocker, model_config, AsyncioGrpcInferenceServerClient)
+    mocks = {name: getattr(AsyncioGrpcInferenceServerClient, name) for name in _GRPC_CLIENT_UP_AND_READY_METHODS}
+    mocker.stopall()
+    # return values configured by patch helpers are restored before each test
+    return {name: (mock, mock.return_value) for name, mock in mocks.items()}
+
+
+@pytest.fixture
+def patched_grpc_server(grpc_server_mocks):
+    mocks = {}
+    for name, (mock, return_value) in grpc_server_mocks.items():
+        # drop call history and return values/side effects set by previous tests
+        mock.reset_mock(return_value=True, side_effect=True)
+        mock.return_value = return_value
+        mocks[name] = mock
+    with unittest.mock.patch.multiple(AsyncioGrpcInferenceServerClient, **mocks):
+        yield AsyncioGrpcInferenceServerClient
+
 
 @pytest.mark.async_timeout(_MAX_TEST_TIME)
 async def test_utils_asyncio_wait_for_model_ready_http_client_not_ready_server(mocker):
@@ -508,28 +555,23 @@ async def test_asynciodel_of_inference_client_does_not_raise_error():
 
 
 @pytest.mark.async_timeout(_MAX_TEST_TIME)
-async def test_async_grpc_client_infer_sample_returns_expected_result_when_infer_on_model_with_batching(mocker):
+@pytest.mark.parametrize(
+    "grpc_server_mocks", (ADD_SUB_WITHOUT_BATCHING_MODEL_CONFIG,), ids=("model_without_batching",), indirect=True
+)
+async def test_async_grpc_client_infer_sample_returns_expected_result_when_infer_on_model_with_batching(
+    mocker, patched_grpc_server
+):
     a = np.array([1], dtype=np.float32)
     b = np.array([1], dtype=np.float32)
     expected_result = {"add": a + b, "sub": a - b}
 
-    model_config = ADD_SUB_WITH_BATCHING_MODEL_CONFIG
-
-    _LOGGER.debug("Creating client")
-    client = AsyncioModelClient(GRPC_LOCALHOST_URL, model_config.model_name)
-    _LOGGER.debug("Creating client")
-    patch_client__server_up_and_ready(mocker, AsyncioGrpcInferenceServerClient)
-    patch_grpc_client__model_up_and_ready(
-        mocker, ADD_SUB_WITHOUT_BATCHING_MODEL_CONFIG, AsyncioGrpcInferenceServerClient
-    )
+    client = AsyncioModelClient(GRPC_LOCALHOST_URL, ADD_SUB_WITH_BATCHING_MODEL_CONFIG.model_name)
     mock_infer = mocker.patch.object(client._infer_client, "infer")
     mock_infer.return_value = wrap_to_http_infer_result(ADD_SUB_WITH_BATCHING_MODEL_CONFIG, "0", expected_result)
-    _LOGGER.debug("Entering client")
     await client.__aenter__()
-    _LOGGER.debug("Entered client")
     result = await client.infer_sample(a, b)
     mock_infer.assert_called_with(
-        model_name=model_config.model_name,
+        model_name=ADD_SUB_WITH_BATCHING_MODEL_CONFIG.model_name,
         model_version="",
         inputs=ANY,
         request_id=ANY,
@@ -538,199 +580,151 @@ async def test_async_grpc_client_infer_sample_returns_expected_result_when_infer
         outputs=ANY,
         client_timeout=60.0,
     )
-    _LOGGER.debug("Exiting client")
     await client.__aexit__(None, None, None)
-    _LOGGER.debug("Exited client")
 
     assert result == expected_result
 
 
 @pytest.mark.async_timeout(_MAX_TEST_TIME)
 async def test_async_grpc_client_non_lazy_aenter_failure_triton_non_ready(mocker):
-    model_config = ADD_SUB_WITH_BATCHING_MODEL_CONFIG
-
-    _LOGGER.debug("Entering timeout 0.2")
-    async with async_timeout.timeout(0.2):
-        _LOGGER.debug("Creating client")
-        client = AsyncioModelClient(GRPC_LOCALHOST_URL, model_config.model_name, init_timeout_s=0.1, lazy_init=False)
-        _LOGGER.debug("Before patching")
+    async with _timeout(0.2):
+        client = AsyncioModelClient(
+            GRPC_LOCALHOST_URL, ADD_SUB_WITH_BATCHING_MODEL_CONFIG.model_name, init_timeout_s=0.1, lazy_init=False
+        )
         patch_client__server_up_and_ready(mocker, AsyncioGrpcInferenceServerClient, ready_server=False)
-        _LOGGER.debug("Entering client")
         with pytest.raises(PyTritonClientTimeoutError):
             await client.__aenter__()
-            _LOGGER.debug("Exiting client without error")
-        _LOGGER.debug("Exited client with error")
-
-    _LOGGER.debug("Exited timeout 0.2")
 
 
 @pytest.mark.async_timeout(_MAX_TEST_TIME)
 async def test_async_grpc_client_non_lazy_aenter_failure_triton_non_live(mocker):
-    model_config = ADD_SUB_WITH_BATCHING_MODEL_CONFIG
-
-    _LOGGER.debug("Entering timeout 0.2")
-    async with async_timeout.timeout(0.2):
-        _LOGGER.debug("Creating client")
-        client = AsyncioModelClient(GRPC_LOCALHOST_URL, model_config.model_name, init_timeout_s=0.1, lazy_init=False)
-        _LOGGER.debug("Before patching")
+    async with _timeout(0.2):
+        client = AsyncioModelClient(
+            GRPC_LOCALHOST_URL, ADD_SUB_WITH_BATCHING_MODEL_CONFIG.model_name, init_timeout_s=0.1, lazy_init=False
+        )
         patch_client__server_up_and_ready(mocker, AsyncioGrpcInferenceServerClient, live_server=False)
-        _LOGGER.debug("Entering client")
         with pytest.raises(PyTritonClientTimeoutError):
             await client.__aenter__()
-            _LOGGER.debug("Exiting client without error")
-        _LOGGER.debug("Exited client with error")
-
-    _LOGGER.debug("Exited timeout 0.2")
 
 
 @pytest.mark.async_timeout(_MAX_TEST_TIME)
 async def test_async_grpc_client_non_lazy_aenter_failure_model_non_ready(mocker):
-    model_config = ADD_SUB_WITH_BATCHING_MODEL_CONFIG
-
-    _LOGGER.debug("Entering timeout 0.2")
-    async with async_timeout.timeout(0.2):
-        _LOGGER.debug("Creating client")
-        client = AsyncioModelClient(GRPC_LOCALHOST_URL, model_config.model_name, init_timeout_s=0.1, lazy_init=False)
-        _LOGGER.debug("Before patching")
+    async with _timeout(0.2):
+        client = AsyncioModelClient(
+            GRPC_LOCALHOST_URL, ADD_SUB_WITH_BATCHING_MODEL_CONFIG.model_name, init_timeout_s=0.1, lazy_init=False
+        )
         patch_client__server_up_and_ready(mocker, AsyncioGrpcInferenceServerClient)
-        patch_grpc_client__model_up_and_ready(mocker, model_config, AsyncioGrpcInferenceServerClient, ready=False)
-        _LOGGER.debug("Entering client")
+        patch_grpc_client__model_up_and_ready(
+            mocker, ADD_SUB_WITH_BATCHING_MODEL_CONFIG, AsyncioGrpcInferenceServerClient, ready=False
+        )
         with pytest.raises(PyTritonClientTimeoutError):
             await client.__aenter__()
-            _LOGGER.debug("Exiting client without error")
-        _LOGGER.debug("Exited client with error")
-
-    _LOGGER.debug("Exited timeout 0.2")
 
 
 @pytest.mark.async_timeout(_MAX_TEST_TIME)
 async def test_async_grpc_client_non_lazy_aenter_failure_model_state_loading(mocker):
-    model_config = ADD_SUB_WITH_BATCHING_MODEL_CONFIG
-
-    _LOGGER.debug("Entering timeout 0.2")
-    async with async_timeout.timeout(0.2):
-        _LOGGER.debug("Creating client")
-        client = AsyncioModelClient(GRPC_LOCALHOST_URL, model_config.model_name, init_timeout_s=0.1, lazy_init=False)
-        _LOGGER.debug("Before patching")
+    async with _timeout(0.2):
+        client = AsyncioModelClient(
+            GRPC_LOCALHOST_URL, ADD_SUB_WITH_BATCHING_MODEL_CONFIG.model_name, init_timeout_s=0.1, lazy_init=False
+        )
         patch_client__server_up_and_ready(mocker, AsyncioGrpcInferenceServerClient)
-        patch_grpc_client__model_up_and_ready(mocker, model_config, AsyncioGrpcInferenceServerClient, state="LOADING")
-        _LOGGER.debug("Entering client")
+        patch_grpc_client__model_up_and_ready(
+            mocker, ADD_SUB_WITH_BATCHING_MODEL_CONFIG, AsyncioGrpcInferenceServerClient, state="LOADING"
+        )
         with pytest.raises(PyTritonClientTimeoutError):
             await client.__aenter__()
-            _LOGGER.debug("Exiting client without error")
-        _LOGGER.debug("Exited client with error")
-
-    _LOGGER.debug("Exited timeout 0.2")
 
 
 @pytest.mark.async_timeout(_MAX_TEST_TIME)
 async def test_async_grpc_client_non_lazy_aenter_failure_model_state_unavailable(mocker):
-    model_config = ADD_SUB_WITH_BATCHING_MODEL_CONFIG
-
-    _LOGGER.debug("Entering timeout 0.2")
-    async with async_timeout.timeout(0.2):
-        _LOGGER.debug("Creating client")
-        client = AsyncioModelClient(GRPC_LOCALHOST_URL, model_config.model_name, init_timeout_s=30, lazy_init=False)
-        _LOGGER.debug("Before patching")
+    async with _timeout(0.2):
+        client = AsyncioModelClient(
+            GRPC_LOCALHOST_URL, ADD_SUB_WITH_BATCHING_MODEL_CONFIG.model_name, init_timeout_s=0.2, lazy_init=False
+        )
         patch_client__server_up_and_ready(mocker, AsyncioGrpcInferenceServerClient)
         patch_grpc_client__model_up_and_ready(
-            mocker, model_config, AsyncioGrpcInferenceServerClient, state="UNAVAILABLE"
+            mocker, ADD_SUB_WITH_BATCHING_MODEL_CONFIG, AsyncioGrpcInferenceServerClient, state="UNAVAILABLE"
         )
-        _LOGGER.debug("Entering client")
         with pytest.raises(PyTritonClientModelUnavailableError):
             await client.__aenter__()
-            _LOGGER.debug("Exiting client without error")
-        _LOGGER.debug("Exited client with error")
 
-    _LOGGER.debug("Exited timeout 0.2")
 
+_NON_LAZY_AENTER_FAILURES_ON_READY_SERVER = (
+    pytest.param(
+        {"model_name": "DUMMY", "init_timeout_s": 0.2, "lazy_init": False},
+        PyTritonClientModelUnavailableError,
+        id="incorrect-name",
+    ),
+    pytest.param(
+        {
+            "model_name": ADD_SUB_WITH_BATCHING_MODEL_CONFIG.model_name,
+            "model_version": "2",
+            "init_timeout_s": 0.2,
+            "lazy_init": False,
+        },
+        PyTritonClientModelUnavailableError,
+        id="incorrect-version",
+    ),
+)
 
-@pytest.mark.async_timeout(_MAX_TEST_TIME)
-async def test_async_grpc_client_non_lazy_aenter_failure_model_incorrect_name(mocker):
-    model_config = ADD_SUB_WITH_BATCHING_MODEL_CONFIG
-
-    _LOGGER.debug("Entering timeout 0.2")
-    async with async_timeout.timeout(0.2):
-        _LOGGER.debug("Creating client")
-        client = AsyncioModelClient(GRPC_LOCALHOST_URL, "DUMMY", init_timeout_s=30, lazy_init=False)
-        _LOGGER.debug("Before patching")
-        patch_client__server_up_and_ready(mocker, AsyncioGrpcInferenceServerClient)
-        patch_grpc_client__model_up_and_ready(mocker, model_config, AsyncioGrpcInferenceServerClient)
-        _LOGGER.debug("Entering client")
-        with pytest.raises(PyTritonClientModelUnavailableError):
-            await client.__aenter__()
-            _LOGGER.debug("Exiting client without error")
-        _LOGGER.debug("Exited client with error")
 
-    _LOGGER.debug("Exited timeout 0.2")
+@pytest.mark.async_timeout(0.2)
+@pytest.mark.parametrize("client_kwargs, expected_error", _NON_LAZY_AENTER_FAILURES_ON_READY_SERVER)
+async def test_async_grpc_client_non_lazy_aenter_failure_on_ready_server(
+    patched_grpc_server, client_kwargs, expected_error
+):
+    client = AsyncioModelClient(GRPC_LOCALHOST_URL, **client_kwargs)
+    with pytest.raises(expected_error):
+        await client.__aenter__()
 
 
 @pytest.mark.async_timeout(_MAX_TEST_TIME)
-async def test_async_grpc_client_non_lazy_aenter_failure_model_incorrect_version(mocker):
-    model_config = ADD_SUB_WITH_BATCHING_MODEL_CONFIG
+async def test_async_grpc_client_infer_sample_fails_on_model_with_batching(patched_grpc_server):
+    client = AsyncioModelClient(GRPC_LOCALHOST_URL, ADD_SUB_WITH_BATCHING_MODEL_CONFIG.model_name)
 
-    _LOGGER.debug("Entering timeout 0.2")
-    async with async_timeout.timeout(0.2):
-        _LOGGER.debug("Creating client")
-        client = AsyncioModelClient(
-            GRPC_LOCALHOST_URL, model_config.model_name, model_version="2", init_timeout_s=30, lazy_init=False
-        )
-        _LOGGER.debug("Before patching")
-        patch_client__server_up_and_ready(mocker, AsyncioGrpcInferenceServerClient)
-        patch_grpc_client__model_up_and_ready(mocker, model_config, AsyncioGrpcInferenceServerClient)
-        _LOGGER.debug("Entering client")
-        with pytest.raises(PyTritonClientModelUnavailableError):
-            await client.__aenter__()
-            _LOGGER.debug("Exiting client without error")
-        _LOGGER.debug("Exited client with error")
+    await client.__aenter__()
 
-    _LOGGER.debug("Exited timeout 0.2")
+    with unittest.mock.patch.object(
+        client._infer_client, "infer", side_effect=PyTritonClientValueError("Dummy exception")
+    ), pytest.raises(PyTritonClientValueError):
+        await client.infer_sample(_A_ONE, _B_ONE)
 
+    await client.__aexit__(None, None, None)
 
-@pytest.mark.async_timeout(_MAX_TEST_TIME)
-async def test_async_grpc_client_infer_sample_fails_on_model_with_batching(mocker):
-    a = np.array([1], dtype=np.float32)
-    b = np.array([1], dtype=np.float32)
 
-    model_config = ADD_SUB_WITH_BATCHING_MODEL_CONFIG
+_NOT_RESPONDING_SERVER_HTTP_URL = "http://localhost:6669"
+_NOT_RESPONDING_SERVER_GRPC_URL = "grpc://localhost:6669"
 
-    _LOGGER.debug("Creating client")
-    client = AsyncioModelClient(GRPC_LOCALHOST_URL, model_config.model_name)
-    _LOGGER.debug("Creating client")
-    patch_client__server_up_and_ready(mocker, AsyncioGrpcInferenceServerClient)
-    patch_grpc_client__model_up_and_ready(mocker, model_config, AsyncioGrpcInferenceServerClient)
-    mock_infer = mocker.patch.object(client._infer_client, "infer")
 
-    def _model_infer_mock(*args, **kwargs):
-        raise PyTritonClientValueError("Dummy exception")
+@pytest.fixture(scope="module")
+async def _not_responding_server_clients():
+    # one client per url is created for the whole module and all of them are closed together on teardown
+    async with contextlib.AsyncExitStack() as stack:
+        yield {
+            url: await stack.enter_async_context(
+                AsyncioModelClient(url, "dummy", init_timeout_s=0.2, inference_timeout_s=0.1)
+            )
+            for url in (_NOT_RESPONDING_SERVER_HTTP_URL, _NOT_RESPONDING_SERVER_GRPC_URL)
+        }
 
-    mock_infer.side_effect = _model_infer_mock
 
-    _LOGGER.debug("Entering client")
-    await client.__aenter__()
-    _LOGGER.debug("Entered client")
+@pytest.fixture(scope="module")
+def http_client(_not_responding_server_clients):
+    return _not_responding_server_clients[_NOT_RESPONDING_SERVER_HTTP_URL]
 
-    with pytest.raises(PyTritonClientValueError):
-        await client.infer_sample(a, b)
 
-    _LOGGER.debug("Exiting client")
-    await client.__aexit__(None, None, None)
-    _LOGGER.debug("Exited client")
+@pytest.fixture(scope="module")
+def grpc_client(_not_responding_server_clients):
+    return _not_responding_server_clients[_NOT_RESPONDING_SERVER_GRPC_URL]
 
 
 @pytest.mark.async_timeout(_MAX_TEST_TIME)
-async def test_async_http_init_passes_timeout(mocker):
-    async with AsyncioModelClient(
-        "http://localhost:6669", "dummy", init_timeout_s=0.2, inference_timeout_s=0.1
-    ) as client:
-        with pytest.raises(PyTritonClientTimeoutError):
-            await client.wait_for_model(timeout_s=0.2)
+async def test_async_http_init_passes_timeout(http_client):
+    with pytest.raises(PyTritonClientTimeoutError):
+        await http_client.wait_for_model(timeout_s=0.2)
 
 
 @pytest.mark.async_timeout(_MAX_TEST_TIME)
-async def test_async_grpc_init_passes_timeout(mocker):
-    async with AsyncioModelClient(
-        "grpc://localhost:6669", "dummy", init_timeout_s=0.2, inference_timeout_s=0.1
-    ) as client:
-        with pytest.raises(PyTritonClientTimeoutError):
-            await client.wait_for_model(timeout_s=0.2)
+async def test_async_grpc_init_passes_timeout(grpc_client):
+    with pytest.raises(PyTritonClientTimeoutError):
+        await grpc_client.wait_for_model(timeout_s=0.2)